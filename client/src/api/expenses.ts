@@ -2,6 +2,7 @@ import { fetchWithTimeout } from "./fetch.ts";
 import type { Expense, PendingExpense } from "../db";
 import { getApiConfig, handleApiError } from "../utils/api";
 import { getRecentMonthsRange } from "../utils/date";
+import { decodeMsgpack, encodeMsgpack } from "../utils/msgpack";
 
 export type ServerExpenseItem = {
   id?: number;
@@ -73,13 +74,69 @@ function toPendingExpense(item: Expense): PendingExpense {
   };
 }
 
+export type SyncResult = { ok_uuids: string[]; ng_uuids: string[] };
+
+// 列指向形式の列（サーバーの SyncExpenseItem のフィールド）
+const SYNC_COLUMNS = ["client_uuid", "date", "amount", "category", "note", "paid_by", "op"] as const;
+
 /**
  * 未送信データをサーバーに同期
+ *
+ * 列指向のMessagePack（対応ブラウザではgzip圧縮）で送る。
+ * バイナリ形式に対応していない旧サーバー（415 / 422）にはJSONで送り直す。
  */
-export async function syncExpenses(items: Expense[]) {
-  const { apiUrl, headers } = getApiConfig();
+export async function syncExpenses(items: Expense[]): Promise<SyncResult> {
   const payloadItems: PendingExpense[] = items.map(toPendingExpense);
 
+  const res = await postSyncMsgpack(payloadItems);
+  if (res.status === 415 || res.status === 422) {
+    return postSyncJson(payloadItems);
+  }
+
+  if (!res.ok) {
+    const text = await res.text();
+    handleApiError(res, text);
+  }
+
+  // レスポンスは失敗したアイテムのインデックスだけを返す（それ以外はすべて成功）
+  // 圧縮（zstd / gzip）はブラウザが Accept-Encoding を付けて自動で展開する
+  const result = decodeMsgpack(new Uint8Array(await res.arrayBuffer())) as { ok: number; ng: number[] };
+  const ng = new Set(result.ng);
+  return {
+    ok_uuids: payloadItems.filter((_, i) => !ng.has(i)).map((item) => item.client_uuid),
+    ng_uuids: result.ng.map((i) => payloadItems[i].client_uuid),
+  };
+}
+
+async function postSyncMsgpack(payloadItems: PendingExpense[]): Promise<Response> {
+  const { apiUrl, headers } = getApiConfig();
+
+  const columns = Object.fromEntries(
+    SYNC_COLUMNS.map((c) => [c, payloadItems.map((item) => item[c] ?? null)])
+  );
+  let body = encodeMsgpack(columns);
+
+  const requestHeaders = new Headers(headers);
+  requestHeaders.set("Content-Type", "application/msgpack");
+  if (typeof CompressionStream !== "undefined") {
+    body = await gzip(body);
+    requestHeaders.set("Content-Encoding", "gzip");
+  }
+
+  return fetchWithTimeout(
+    `${apiUrl}/sync/expenses`,
+    {
+      method: "POST",
+      headers: requestHeaders,
+      body,
+    },
+    DEFAULT_TIMEOUT_MS
+  );
+}
+
+async function postSyncJson(payloadItems: PendingExpense[]): Promise<SyncResult> {
+  const { apiUrl, headers } = getApiConfig();
+
   const res = await fetchWithTimeout(
     `${apiUrl}/sync/expenses`,
     {
@@ -95,5 +152,10 @@ export async function syncExpenses(items: Expense[]) {
     handleApiError(res, text);
   }
 
-  return (await res.json()) as { ok_uuids: string[]; ng_uuids: string[] };
+  return (await res.json()) as SyncResult;
+}
+
+async function gzip(data: Uint8Array<ArrayBuffer>): Promise<Uint8Array<ArrayBuffer>> {
+  const stream = new Blob([data]).stream().pipeThrough(new CompressionStream("gzip"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
 }
@@ -0,0 +1,164 @@
+/**
+ * 同期で使うMessagePackの最小限のエンコーダー/デコーダー
+ * （nil / bool / 数値 / 文字列 / 配列 / マップのみ）
+ */
+export type MsgpackValue =
+  | null
+  | boolean
+  | number
+  | string
+  | MsgpackValue[]
+  | { [key: string]: MsgpackValue };
+
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
+/**
+ * 値をMessagePackにエンコード
+ */
+export function encodeMsgpack(value: MsgpackValue): Uint8Array<ArrayBuffer> {
+  const out: number[] = [];
+  write(out, value);
+  return new Uint8Array(out);
+}
+
+function pushUint(out: number[], value: number, bytes: number) {
+  for (let i = bytes - 1; i >= 0; i--) {
+    out.push(Math.floor(value / 2 ** (8 * i)) & 0xff);
+  }
+}
+
+function writeHeader(out: number[], length: number, fix: number, fixMax: number, codes: [number, number, number]) {
+  if (length <= fixMax) {
+    out.push(fix | length);
+  } else if (codes[0] !== 0 && length <= 0xff) {
+    out.push(codes[0]);
+    pushUint(out, length, 1);
+  } else if (length <= 0xffff) {
+    out.push(codes[1]);
+    pushUint(out, length, 2);
+  } else {
+    out.push(codes[2]);
+    pushUint(out, length, 4);
+  }
+}
+
+function write(out: number[], value: MsgpackValue) {
+  if (value === null) {
+    out.push(0xc0);
+  } else if (typeof value === "boolean") {
+    out.push(value ? 0xc3 : 0xc2);
+  } else if (typeof value === "number") {
+    writeNumber(out, value);
+  } else if (typeof value === "string") {
+    const bytes = textEncoder.encode(value);
+    writeHeader(out, bytes.length, 0xa0, 31, [0xd9, 0xda, 0xdb]);
+    for (const b of bytes) out.push(b);
+  } else if (Array.isArray(value)) {
+    // array8 は存在しないため 0 を渡す
+    writeHeader(out, value.length, 0x90, 15, [0, 0xdc, 0xdd]);
+    for (const v of value) write(out, v);
+  } else {
+    const entries = Object.entries(value);
+    writeHeader(out, entries.length, 0x80, 15, [0, 0xde, 0xdf]);
+    for (const [k, v] of entries) {
+      write(out, k);
+      write(out, v);
+    }
+  }
+}
+
+function writeNumber(out: number[], value: number) {
+  if (Number.isInteger(value) && value >= 0 && value <= 0xffffffff) {
+    if (value < 0x80) {
+      out.push(value);
+    } else if (value <= 0xff) {
+      out.push(0xcc);
+      pushUint(out, value, 1);
+    } else if (value <= 0xffff) {
+      out.push(0xcd);
+      pushUint(out, value, 2);
+    } else {
+      out.push(0xce);
+      pushUint(out, value, 4);
+    }
+  } else if (Number.isInteger(value) && value < 0 && value >= -0x80000000) {
+    if (value >= -32) {
+      out.push(value & 0xff);
+    } else {
+      out.push(0xd2);
+      pushUint(out, value >>> 0, 4);
+    }
+  } else {
+    // 32ビットに収まらない整数・小数は float64
+    const view = new DataView(new ArrayBuffer(8));
+    view.setFloat64(0, value);
+    out.push(0xcb);
+    for (let i = 0; i < 8; i++) out.push(view.getUint8(i));
+  }
+}
+
+/**
+ * MessagePackをデコード（encodeMsgpack と同じ型に加えて、他の幅の整数・float32に対応）
+ */
+export function decodeMsgpack(bytes: Uint8Array): unknown {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+
+  const take = (n: number) => {
+    if (pos + n > bytes.length) throw new Error("MessagePack: unexpected end of data");
+    const start = pos;
+    pos += n;
+    return start;
+  };
+  const str = (n: number) => {
+    const start = take(n);
+    return textDecoder.decode(bytes.subarray(start, start + n));
+  };
+  const arr = (n: number): unknown[] => Array.from({ length: n }, () => read());
+  const map = (n: number) => {
+    const obj: Record<string, unknown> = {};
+    for (let i = 0; i < n; i++) {
+      const key = read();
+      obj[String(key)] = read();
+    }
+    return obj;
+  };
+
+  function read(): unknown {
+    const code = view.getUint8(take(1));
+    if (code < 0x80) return code;
+    if (code >= 0xe0) return code - 0x100;
+    if (code >= 0xa0 && code <= 0xbf) return str(code & 0x1f);
+    if (code >= 0x90 && code <= 0x9f) return arr(code & 0x0f);
+    if (code >= 0x80 && code <= 0x8f) return map(code & 0x0f);
+    switch (code) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xcc: return view.getUint8(take(1));
+      case 0xcd: return view.getUint16(take(2));
+      case 0xce: return view.getUint32(take(4));
+      case 0xcf: return Number(view.getBigUint64(take(8)));
+      case 0xd0: return view.getInt8(take(1));
+      case 0xd1: return view.getInt16(take(2));
+      case 0xd2: return view.getInt32(take(4));
+      case 0xd3: return Number(view.getBigInt64(take(8)));
+      case 0xca: return view.getFloat32(take(4));
+      case 0xcb: return view.getFloat64(take(8));
+      case 0xd9: return str(view.getUint8(take(1)));
+      case 0xda: return str(view.getUint16(take(2)));
+      case 0xdb: return str(view.getUint32(take(4)));
+      case 0xdc: return arr(view.getUint16(take(2)));
+      case 0xdd: return arr(view.getUint32(take(4)));
+      case 0xde: return map(view.getUint16(take(2)));
+      case 0xdf: return map(view.getUint32(take(4)));
+      default:
+        throw new Error(`MessagePack: unsupported type 0x${code.toString(16)}`);
+    }
+  }
+
+  const value = read();
+  if (pos !== bytes.length) throw new Error("MessagePack: trailing data");
+  return value;
+}
@@ -1,7 +1,9 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.db import Base, engine
+from app.summary_view import ensure_monthly_summary_view, start_refresher, stop_refresher
 from app.routers.sync import router as sync_router
 from app.routers.expenses import router as expenses_router
 from app.routers.stats import router as stats_router
@@ -11,7 +13,13 @@ from app.middleware.auth import APIKeyMiddleware
 from app.middleware.lan_only import LanOnlyMiddleware
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI() # FastAPIのインスタンスを作成
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_refresher(engine) # 集計ビューのリフレッシュスケジューラを起動
+    yield
+    stop_refresher() # 終了時にスケジューラを停止
+
+app = FastAPI(lifespan=lifespan) # FastAPIのインスタンスを作成
 
 # CORS設定を環境変数から読み込む
 cors_origins_env = os.environ.get("CORS_ORIGINS", "")
@@ -49,6 +57,7 @@ app.add_middleware(APIKeyMiddleware)
 
 # 開発用：起動時にテーブル作成（本番はAlembicにする）
 Base.metadata.create_all(bind=engine) # テーブルを作成
+ensure_monthly_summary_view(engine) # 月別集計のマテリアライズドビューを作成
 
 @app.get("/health") # 健康状態を返すエンドポイント
 def health(): # 健康状態を返すエンドポイント
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, desc
 from app.db import get_db
 from app.models.expense import Expense
+from app.summary_view import mark_summary_dirty
 
 router = APIRouter(prefix="/expenses", tags=["expenses"]) # 支出ルーター
 
@@ -50,6 +51,7 @@ def soft_delete_expense(expense_id: int, db: Session = Depends(get_db)):
     try:
         exp.deleted_at = datetime.now(timezone.utc)
         db.commit()
+        mark_summary_dirty() # 集計ビューのリフレッシュを予約
         return {"ok": True, "id": expense_id}
     except Exception as e:
         db.rollback()
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, timedelta
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query, HTTPException
 from pydantic import BaseModel
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.constants.category import get_category_order
+from app.summary_view import MONTHLY_SUMMARY_VIEW, SUMMARY_VIEW_FRESH_SQL
 
 router = APIRouter(prefix="/summary", tags=["summary"])
 
@@ -37,6 +38,80 @@ class ExpenseItem(BaseModel):
     paid_by: Optional[str] = None
 
 
+def _next_month(d: date) -> date:
+    return date(d.year + 1, 1, 1) if d.month == 12 else date(d.year, d.month + 1, 1)
+
+
+def _full_month_range(start: date, end: date) -> Optional[tuple[date, date]]:
+    """[start, end] に完全に含まれる月の範囲を [月初, 終了月の翌月初) で返す（なければNone）"""
+    # date の上限付近は翌月初・翌日が表せないため、ビューを使わず生データから集計する
+    if end == date.max or (start.year, start.month) == (date.max.year, date.max.month):
+        return None
+    month_start = start if start.day == 1 else _next_month(start)
+    end_exclusive = end + timedelta(days=1)
+    month_end = end_exclusive if end_exclusive.day == 1 else end.replace(day=1)
+    if month_start >= month_end:
+        return None
+    return month_start, month_end
+
+
+def _aggregate(db: Session, key: Optional[str], start: date, end: date):
+    """期間の合計を集計する（keyを指定するとその列でグループ化）
+
+    丸ごと含まれる月はマテリアライズドビューから、端の月の一部だけ生データから集計する。
+    ビューが最新でない（リフレッシュ待ち）場合は丸ごと含まれる月も生データから集計する。
+    鮮度の判定は集計と同じSQL文で行うため、同じスナップショットで判定・集計される。
+    """
+    select_key = f"{key}, " if key else ""
+    group_by = f"GROUP BY {key}" if key else ""
+    params = {"start": start, "end": end}
+
+    full = _full_month_range(start, end)
+
+    if full is None:
+        sql = text(f"""
+            SELECT {select_key}COALESCE(SUM(amount), 0) AS total
+            FROM expenses
+            WHERE date >= :start AND date <= :end
+            AND deleted_at IS NULL
+            {group_by}
+        """)
+    else:
+        params["month_start"], params["month_end"] = full
+        # fresh はどちらか一方の枝だけが実行される一度きりの条件になる
+        sql = text(f"""
+            WITH state AS (
+                SELECT {SUMMARY_VIEW_FRESH_SQL} AS fresh
+            )
+            SELECT {select_key}COALESCE(SUM(total), 0) AS total
+            FROM (
+                SELECT {select_key}total
+                FROM {MONTHLY_SUMMARY_VIEW}
+                WHERE month >= :month_start AND month < :month_end
+                AND (SELECT fresh FROM state) IS TRUE
+                UNION ALL
+                SELECT {select_key}amount AS total
+                FROM expenses
+                WHERE date >= :month_start AND date < :month_end
+                AND deleted_at IS NULL
+                AND (SELECT fresh FROM state) IS NOT TRUE
+                UNION ALL
+                SELECT {select_key}amount AS total
+                FROM expenses
+                WHERE date >= :start AND date < :month_start
+                AND deleted_at IS NULL
+                UNION ALL
+                SELECT {select_key}amount AS total
+                FROM expenses
+                WHERE date >= :month_end AND date <= :end
+                AND deleted_at IS NULL
+            ) AS combined
+            {group_by}
+        """)
+
+    return db.execute(sql, params).all()
+
+
 @router.get("", response_model=SummaryResponse)
 def get_summary(
     start: date = Query(...),
@@ -46,14 +121,8 @@ def get_summary(
     if start > end:
         raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date")
     
-    sql = text("""
-        SELECT COALESCE(SUM(amount), 0) AS total
-        FROM expenses
-        WHERE date >= :start AND date <= :end
-        AND deleted_at IS NULL
-    """)
-
-    row = db.execute(sql, {"start": start, "end": end}).first()
+    rows = _aggregate(db, None, start, end)
+    row = rows[0] if rows else None
     total = int(row.total) if row and row.total is not None else 0
     return SummaryResponse(start=start, end=end, total=total)
 
@@ -67,15 +136,7 @@ def get_summary_by_category(
     if start > end:
         raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date")
     
-    sql = text("""
-        SELECT category, COALESCE(SUM(amount), 0) AS total
-        FROM expenses
-        WHERE date >= :start AND date <= :end
-        AND deleted_at IS NULL
-        GROUP BY category
-    """)
-
-    rows = db.execute(sql, {"start": start, "end": end}).all()
+    rows = _aggregate(db, "category", start, end)
     # 固定順序でソート
     items = [CategorySummaryItem(category=r.category, total=int(r.total)) for r in rows]
     items.sort(key=lambda x: (get_category_order(x.category), x.category))
@@ -91,16 +152,8 @@ def get_summary_by_payer(
     if start > end:
         raise HTTPException(status_code=400, detail="Start date must be less than or equal to end date")
     
-    sql = text("""
-        SELECT paid_by, COALESCE(SUM(amount), 0) AS total
-        FROM expenses
-        WHERE date >= :start AND date <= :end
-        AND deleted_at IS NULL
-        GROUP BY paid_by
-        ORDER BY total DESC
-    """)
-
-    rows = db.execute(sql, {"start": start, "end": end}).all()
+    rows = _aggregate(db, "paid_by", start, end)
+    rows = sorted(rows, key=lambda r: r.total, reverse=True)
     return [PayerSummaryItem(paid_by=r.paid_by, total=int(r.total)) for r in rows]
 
 
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.dialects.postgresql import insert
 import logging
@@ -7,6 +7,8 @@ import logging
 from app.db import get_db
 from app.models.expense import Expense
 from app.schemas.sync import SyncExpensesRequest
+from app.sync_codec import JSON, decode_sync_request, encode_compact_response, sync_request_openapi
+from app.summary_view import mark_summary_dirty
 
 logger = logging.getLogger(__name__)
 
@@ -15,27 +17,61 @@ router = APIRouter(prefix="/sync", tags=["sync"])
 # 一度に同期できる最大件数（DoS対策）
 MAX_SYNC_ITEMS = 1000
 
-@router.post("/expenses")
-def sync_expenses(payload: SyncExpensesRequest, db: Session = Depends(get_db)):
+
+async def read_sync_payload(request: Request) -> tuple[SyncExpensesRequest, str]:
+    """Content-Type / Content-Encoding に応じてリクエストボディをデコードする"""
+    body = await request.body()
+    return decode_sync_request(
+        body,
+        request.headers.get("content-type"),
+        request.headers.get("content-encoding"),
+    )
+
+
+@router.post("/expenses", openapi_extra=sync_request_openapi())
+def sync_expenses(
+    request: Request,
+    decoded: tuple[SyncExpensesRequest, str] = Depends(read_sync_payload),
+    db: Session = Depends(get_db),
+):
+    payload, media_type = decoded
+
     # デバッグ用: リクエスト受信をログ出力
-    logger.info(f"同期リクエスト受信: {len(payload.items)}件")
-    
-    if not payload.items:
-        return {"ok_uuids": [], "ng_uuids": []}
-    
+    logger.info(f"同期リクエスト受信: {len(payload.items)}件 ({media_type})")
+
     if len(payload.items) > MAX_SYNC_ITEMS:
         raise HTTPException(
             status_code=400,
             detail=f"Too many items. Maximum {MAX_SYNC_ITEMS} items allowed per request"
         )
     
-    ok_uuids: list[str] = []
-    ng_uuids: list[str] = []
+    ng_indices = _apply_sync_items(payload, db) if payload.items else []
+
+    if media_type == JSON:
+        ng = set(ng_indices)
+        return {
+            "ok_uuids": [item.client_uuid for i, item in enumerate(payload.items) if i not in ng],
+            "ng_uuids": [payload.items[i].client_uuid for i in ng_indices],
+        }
+
+    # バイナリ形式ではUUIDを送り返さず、失敗したアイテムのインデックスだけを返す
+    body, headers = encode_compact_response(
+        len(payload.items) - len(ng_indices),
+        ng_indices,
+        media_type,
+        request.headers.get("accept-encoding"),
+    )
+    return Response(content=body, headers=headers)
+
+
+def _apply_sync_items(payload: SyncExpensesRequest, db: Session) -> list[int]:
+    """アイテムをUPSERTし、失敗したアイテムのインデックスを返す"""
+    ng_indices: list[int] = []
 
     now = datetime.now(timezone.utc)
 
     try:
-        for item in payload.items:
+        for i, item in enumerate(payload.items):
             try:
                 deleted_at_value = now if item.op == "delete" else None
 
@@ -65,11 +101,10 @@ def sync_expenses(payload: SyncExpensesRequest, db: Session = Depends(get_db)):
                 )
 
                 db.execute(stmt)
-                ok_uuids.append(item.client_uuid)
 
             except Exception as e:
                 logger.error(f"Failed to sync expense {item.client_uuid}: {e}", exc_info=True)
-                ng_uuids.append(item.client_uuid)
+                ng_indices.append(i)
 
         db.commit()
     except Exception as e:
@@ -77,4 +112,7 @@ def sync_expenses(payload: SyncExpensesRequest, db: Session = Depends(get_db)):
         logger.error(f"Transaction failed during sync: {e}", exc_info=True)
         raise
 
-    return {"ok_uuids": ok_uuids, "ng_uuids": ng_uuids}
+    if len(ng_indices) < len(payload.items):
+        mark_summary_dirty() # 集計ビューのリフレッシュを予約
+
+    return ng_indices
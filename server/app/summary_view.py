@@ -0,0 +1,260 @@
+import logging
+import os
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# 月別 × カテゴリ × 支払者 の集計を持つマテリアライズドビュー
+MONTHLY_SUMMARY_VIEW = "expense_monthly_summary"
+
+# ビューの鮮度を管理するテーブル
+#   version   : expenses に書き込む（INSERT/UPDATE/DELETE/TRUNCATE）トランザクションごとにトリガーで加算
+#   refreshed : 最後のリフレッシュ直前に読んだ version
+# 両者が一致している間だけビューは最新とみなす
+SUMMARY_STATE_TABLE = "expense_summary_state"
+
+# 同期書き込み後、リフレッシュするまで待つ秒数（連続した書き込みをまとめる）
+REFRESH_DEBOUNCE_SECONDS = float(os.environ.get("SUMMARY_REFRESH_DEBOUNCE", "2.0"))
+
+# 書き込みが続いても、最初の未反映の書き込みからこの秒数以内には必ずリフレッシュする
+REFRESH_MAX_WAIT_SECONDS = float(os.environ.get("SUMMARY_REFRESH_MAX_WAIT", "10.0"))
+
+# アプリ外からの書き込み（別プロセス・手動SQL・リストアなど）に備えて鮮度を確認する間隔
+STALE_CHECK_SECONDS = float(os.environ.get("SUMMARY_STALE_CHECK_INTERVAL", "60.0"))
+
+_DDL = [
+    f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {MONTHLY_SUMMARY_VIEW} AS
+    SELECT
+        DATE_TRUNC('month', date)::date AS month,
+        category,
+        paid_by,
+        SUM(amount)::bigint AS total
+    FROM expenses
+    WHERE deleted_at IS NULL
+    GROUP BY 1, 2, 3
+    """,
+    # REFRESH ... CONCURRENTLY にはユニークインデックスが必須
+    f"""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_{MONTHLY_SUMMARY_VIEW}_key
+    ON {MONTHLY_SUMMARY_VIEW} (month, category, paid_by)
+    """,
+    # 端の月を生データから集計するときに使う
+    # IF NOT EXISTS でも expenses の書き込みをロックするため、存在しないときだけ実行する
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('idx_expenses_date_active') IS NULL THEN
+            CREATE INDEX idx_expenses_date_active
+            ON expenses (date) WHERE deleted_at IS NULL;
+        END IF;
+    END
+    $$
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS {SUMMARY_STATE_TABLE} (
+        name VARCHAR(16) PRIMARY KEY,
+        value BIGINT NOT NULL
+    )
+    """,
+    # 初回は未リフレッシュ扱い（version > refreshed）
+    f"""
+    INSERT INTO {SUMMARY_STATE_TABLE} (name, value)
+    VALUES ('version', 1), ('refreshed', 0)
+    ON CONFLICT (name) DO NOTHING
+    """,
+    # version の加算は1トランザクションにつき1回だけ行う（app.summary_bumped で判定）。
+    # 行ごとの遅延制約トリガーなのでコミット直前に実行され、状態テーブルの version 行のロックは
+    # コミット処理の間だけ保持される。同時に書き込むトランザクションはコミット時にこの行で短時間
+    # 直列化されるが、ロック待ちの間に他のロックを取りに行くことはないのでデッドロックにはならない。
+    # 1件ずつUPSERTする同期でも追加のUPDATEは1回で済む。
+    f"""
+    CREATE OR REPLACE FUNCTION bump_expense_summary_version() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('app.summary_bumped', true) IS DISTINCT FROM '1' THEN
+            PERFORM set_config('app.summary_bumped', '1', true);
+            UPDATE {SUMMARY_STATE_TABLE} SET value = value + 1 WHERE name = 'version';
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # トリガーは存在しないときだけ作成する（DROP / CREATE TRIGGER は expenses をロックするため、
+    # 起動・リロードのたびに実行すると同期や集計を止めてしまう）。
+    # 制約トリガーは CREATE OR REPLACE できないので、旧版の文単位トリガーが残っていれば一度だけ作り直す。
+    # TRUNCATE は制約トリガーにできないので文単位のトリガーで扱う
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = 'expenses'::regclass
+            AND tgname = 'trg_expenses_summary_version'
+            AND tgconstraint <> 0
+        ) THEN
+            DROP TRIGGER IF EXISTS trg_expenses_summary_version ON expenses;
+            CREATE CONSTRAINT TRIGGER trg_expenses_summary_version
+            AFTER INSERT OR UPDATE OR DELETE ON expenses
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW EXECUTE FUNCTION bump_expense_summary_version();
+        END IF;
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger
+            WHERE tgrelid = 'expenses'::regclass
+            AND tgname = 'trg_expenses_summary_version_truncate'
+        ) THEN
+            CREATE TRIGGER trg_expenses_summary_version_truncate
+            AFTER TRUNCATE ON expenses
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_expense_summary_version();
+        END IF;
+    END
+    $$
+    """,
+]
+
+# ビューが最新かどうかを返すSQL式（集計クエリに埋め込んで同じスナップショットで判定するためにも使う）
+SUMMARY_VIEW_FRESH_SQL = f"""(
+    (SELECT value FROM {SUMMARY_STATE_TABLE} WHERE name = 'version')
+    = (SELECT value FROM {SUMMARY_STATE_TABLE} WHERE name = 'refreshed')
+)"""
+
+_IS_FRESH_SQL = f"SELECT {SUMMARY_VIEW_FRESH_SQL} AS fresh"
+
+
+def ensure_monthly_summary_view(engine: Engine) -> None:
+    """マテリアライズドビュー・インデックス・鮮度管理用のテーブルとトリガーを作成する（存在すれば何もしない）"""
+    with engine.begin() as conn:
+        for sql in _DDL:
+            conn.execute(text(sql))
+
+
+def is_summary_view_fresh(db: Session | Connection) -> bool:
+    """ビューが expenses の最新の内容を反映しているかをDB上の version で判定する
+
+    書き込みはコミットと同時に version を進めるため、どのプロセス・経路の書き込みでも
+    コミット後は最新でない（生データから集計すべき）と判定される。
+    """
+    return bool(db.execute(text(_IS_FRESH_SQL)).scalar())
+
+
+class SummaryViewRefresher:
+    """書き込み後にデバウンスしてビューを CONCURRENTLY でリフレッシュするバックグラウンドスケジューラ
+
+    アプリからの書き込みは mark_dirty で即座にリフレッシュを予約する。
+    それ以外の書き込みに備えて、一定間隔でDB上の鮮度も確認する。
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        debounce: float = REFRESH_DEBOUNCE_SECONDS,
+        max_wait: float = REFRESH_MAX_WAIT_SECONDS,
+        check_interval: float = STALE_CHECK_SECONDS,
+    ):
+        self._engine = engine
+        self._debounce = debounce
+        self._max_wait = max_wait
+        self._check_interval = check_interval
+        self._cond = threading.Condition()
+        self._due_at: float | None = time.monotonic()  # 起動直後に1回リフレッシュ
+        self._first_dirty_at: float | None = None  # 未反映の最初の書き込みの時刻
+        self._stopping = False
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="summary-view-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def mark_dirty(self) -> None:
+        """書き込みがコミットされたことを通知する（リフレッシュを予約する）
+
+        書き込みのたびに予定を debounce 秒後へ延ばすが、最初の書き込みから max_wait 秒より先には延ばさない。
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._first_dirty_at is None:
+                self._first_dirty_at = now
+            self._due_at = min(now + self._debounce, self._first_dirty_at + self._max_wait)
+            self._cond.notify_all()
+
+    def _wait_until_due(self) -> bool:
+        """リフレッシュ予定時刻まで待つ。停止時は False を返す"""
+        with self._cond:
+            while not self._stopping:
+                if self._due_at is None:
+                    self._cond.wait(self._check_interval)
+                    if self._due_at is None:
+                        return True  # 定期チェック
+                    continue
+                remaining = self._due_at - time.monotonic()
+                if remaining <= 0:
+                    self._due_at = None
+                    self._first_dirty_at = None
+                    return True
+                self._cond.wait(remaining)
+            return False
+
+    def _run(self) -> None:
+        while self._wait_until_due():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh {MONTHLY_SUMMARY_VIEW}: {e}", exc_info=True)
+                with self._cond:
+                    if self._due_at is None:
+                        self._due_at = time.monotonic() + max(self._debounce, 5.0)  # 少し待って再試行
+
+    def refresh(self) -> None:
+        """最新でなければリフレッシュする
+
+        リフレッシュ前に読んだ version を記録する。リフレッシュ中にコミットされた書き込みは
+        version を進めるので、その分は次のリフレッシュまで最新でないと判定される。
+        """
+        with self._engine.begin() as conn:
+            if is_summary_view_fresh(conn):
+                return
+            version = conn.execute(
+                text(f"SELECT value FROM {SUMMARY_STATE_TABLE} WHERE name = 'version'")
+            ).scalar_one()
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {MONTHLY_SUMMARY_VIEW}"))
+            conn.execute(
+                text(f"UPDATE {SUMMARY_STATE_TABLE} SET value = :version WHERE name = 'refreshed'"),
+                {"version": version},
+            )
+
+
+_refresher: SummaryViewRefresher | None = None
+
+
+def start_refresher(engine: Engine) -> SummaryViewRefresher:
+    global _refresher
+    if _refresher is None:
+        _refresher = SummaryViewRefresher(engine)
+    _refresher.start()
+    return _refresher
+
+
+def stop_refresher() -> None:
+    if _refresher is not None:
+        _refresher.stop()
+
+
+def mark_summary_dirty() -> None:
+    """支出データの書き込み後に呼び出す"""
+    if _refresher is not None:
+        _refresher.mark_dirty()
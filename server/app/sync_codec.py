@@ -0,0 +1,261 @@
+import gzip
+import io
+import math
+import zlib
+from datetime import date
+import cbor2
+import msgpack
+import zstandard
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from app.schemas.sync import SyncExpenseItem, SyncExpensesRequest
+
+# 同期リクエストで受け付けるメディアタイプ
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+_MEDIA_TYPES = {
+    "application/json": JSON,
+    "application/msgpack": MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+    "application/cbor": CBOR,
+}
+
+# 列指向フォーマットの列名（SyncExpenseItem のフィールドと同じ）
+COLUMNS = ("client_uuid", "date", "amount", "category", "note", "paid_by", "op")
+REQUIRED_COLUMNS = ("client_uuid", "date", "amount", "category", "paid_by")
+
+# 展開後の最大サイズ（圧縮爆弾対策）。1000件 × 最大長でも十分収まる
+MAX_DECODED_BYTES = 4 * 1024 * 1024
+
+
+def media_type_of(content_type: str | None) -> str | None:
+    """Content-Type ヘッダーから対応するメディアタイプを返す
+
+    未指定・application/json・*/*+json はJSON扱い（FastAPIのJSONボディと同じ判定）。
+    それ以外の未対応のタイプは None を返す。
+    """
+    if not content_type:
+        return JSON
+    base = content_type.split(";", 1)[0].strip().lower()
+    main, _, sub = base.partition("/")
+    if main == "application" and (sub == "json" or sub.endswith("+json")):
+        return JSON
+    return _MEDIA_TYPES.get(base)
+
+
+def decompress(body: bytes, content_encoding: str | None) -> bytes:
+    """Content-Encoding（gzip / zstd / identity）に従ってリクエストボディを展開する"""
+    encoding = (content_encoding or "identity").strip().lower()
+    try:
+        if encoding == "identity":
+            data = body
+        elif encoding in ("gzip", "x-gzip"):
+            data = _gunzip(body)
+        elif encoding == "zstd":
+            # 複数フレームが連結されている場合もすべて展開する
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body), read_across_frames=True)
+            with reader:
+                data = reader.read(MAX_DECODED_BYTES + 1)
+        else:
+            raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding: {encoding}")
+    except (zlib.error, zstandard.ZstdError) as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decompress request body: {e}")
+
+    if len(data) > MAX_DECODED_BYTES:
+        raise HTTPException(status_code=413, detail="Request body too large")
+    return data
+
+
+def _gunzip(body: bytes) -> bytes:
+    """複数メンバーが連結されたgzipも含めて展開する（上限を超えた時点で打ち切る）"""
+    out = bytearray()
+    rest = body
+    while rest:
+        d = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        out += d.decompress(rest, MAX_DECODED_BYTES + 1 - len(out))
+        if len(out) > MAX_DECODED_BYTES:
+            break
+        if not d.eof:
+            raise zlib.error("truncated gzip stream")
+        rest = d.unused_data
+    return bytes(out)
+
+
+def columns_to_items(columns: object) -> list[dict]:
+    """列指向の {"client_uuid": [...], "amount": [...], ...} を行（アイテム）のリストに変換する
+
+    note と op の列は省略可能（省略時は SyncExpenseItem のデフォルト値）。
+    """
+    if not isinstance(columns, dict):
+        raise HTTPException(status_code=400, detail="Columnar payload must be a map of field name to array")
+
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(sorted(map(str, unknown)))}")
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(missing)}")
+
+    present = [c for c in COLUMNS if c in columns]
+    for c in present:
+        if not isinstance(columns[c], list):
+            raise HTTPException(status_code=400, detail=f"Column '{c}' must be an array")
+    lengths = {len(columns[c]) for c in present}
+    if len(lengths) != 1:
+        raise HTTPException(status_code=400, detail="All columns must have the same length")
+
+    # バイト列・未定義値・未知のタグ・NaN などは422のエラー応答（input）にJSONで書き戻せないため、
+    # バリデーションに渡す前に400で弾く
+    for c in present:
+        for i, value in enumerate(columns[c]):
+            if not _is_scalar(value):
+                raise HTTPException(status_code=400, detail=f"Unsupported value type in column '{c}' at index {i}: {type(value).__name__}")
+
+    return [dict(zip(present, row)) for row in zip(*(columns[c] for c in present))]
+
+
+def _is_scalar(value: object) -> bool:
+    """列の値として受け付ける型（str / int / float / None / date）かどうか"""
+    if value is None or isinstance(value, (str, int, date)):
+        return True
+    return isinstance(value, float) and math.isfinite(value)
+
+
+def _validate(data: object, json_mode: bool = False) -> SyncExpensesRequest:
+    try:
+        if json_mode:
+            return SyncExpensesRequest.model_validate_json(data)
+        return SyncExpensesRequest.model_validate(data)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
+
+
+def decode_sync_request(body: bytes, content_type: str | None, content_encoding: str | None) -> tuple[SyncExpensesRequest, str]:
+    """同期リクエストを展開・デコードし、SyncExpensesRequest と同じバリデーションにかける
+
+    Returns:
+        (検証済みリクエスト, リクエストのメディアタイプ)
+    """
+    media_type = media_type_of(content_type)
+    data = decompress(body, content_encoding)
+
+    if media_type is None:
+        # 未対応のタイプは従来どおり（FastAPIと同じく）ボディをそのまま検証して422にする
+        return _validate(data), JSON
+    if media_type == JSON:
+        if not data:
+            # 空ボディは FastAPI の必須ボディ欠落と同じエラーにする
+            raise RequestValidationError([{"type": "missing", "loc": ("body",), "msg": "Field required", "input": None}])
+        # JSONモードで検証し、エラー（json_invalid など）や型変換を従来と揃える
+        return _validate(data, json_mode=True), media_type
+
+    try:
+        if media_type == MSGPACK:
+            decoded = msgpack.unpackb(data, raw=False)
+        else:
+            decoded = cbor2.loads(data)
+    # 途中で切れたCBORは EOFError、範囲外の日付タグは OverflowError、深すぎる入れ子は RecursionError になる
+    except (cbor2.CBORDecodeError, msgpack.UnpackException, ValueError, TypeError, OverflowError, RecursionError) as e:
+        raise HTTPException(status_code=400, detail=f"Failed to decode request body: {e}")
+
+    return _validate({"items": columns_to_items(decoded)}), media_type
+
+
+def _inline_refs(schema: object, defs: dict) -> object:
+    """"#/$defs/..." への参照を展開する（OpenAPIの操作定義に直接埋め込むため）"""
+    if isinstance(schema, dict):
+        ref = schema.get("$ref", "")
+        if ref.startswith("#/$defs/"):
+            return _inline_refs(defs[ref.removeprefix("#/$defs/")], defs)
+        return {k: _inline_refs(v, defs) for k, v in schema.items() if k != "$defs"}
+    if isinstance(schema, list):
+        return [_inline_refs(v, defs) for v in schema]
+    return schema
+
+
+def sync_request_openapi() -> dict:
+    """POST /sync/expenses のリクエストボディのOpenAPI定義（メディアタイプごと）"""
+    json_schema = SyncExpensesRequest.model_json_schema()
+    json_schema = _inline_refs(json_schema, json_schema.get("$defs", {}))
+
+    item_properties = SyncExpenseItem.model_json_schema()["properties"]
+    columnar_schema = {
+        "title": "SyncExpensesColumns",
+        "description": "列指向形式: SyncExpenseItem のフィールドごとの配列（すべて同じ長さ、note と op は省略可）",
+        "type": "object",
+        "properties": {
+            c: {"type": "array", "items": item_properties[c], "maxItems": 1000}
+            for c in COLUMNS
+        },
+        "required": list(REQUIRED_COLUMNS),
+        "additionalProperties": False,
+    }
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                JSON: {"schema": json_schema},
+                MSGPACK: {"schema": columnar_schema},
+                CBOR: {"schema": columnar_schema},
+            },
+        },
+    }
+
+
+def encode_compact_response(ok_count: int, ng_indices: list[int], media_type: str, accept_encoding: str | None) -> tuple[bytes, dict[str, str]]:
+    """バイナリ形式のレスポンスを作る
+
+    UUIDを送り返す代わりに、失敗したアイテムのリクエスト内インデックスだけを返す
+    （それ以外はすべて成功）。Accept-Encoding に応じて zstd / gzip で圧縮する。
+
+    Returns:
+        (レスポンスボディ, レスポンスヘッダー)
+    """
+    payload = {"ok": ok_count, "ng": ng_indices}
+    body = msgpack.packb(payload) if media_type == MSGPACK else cbor2.dumps(payload)
+    headers = {"Content-Type": media_type, "Vary": "Accept-Encoding"}
+
+    encoding = _choose_encoding(accept_encoding)
+    if encoding == "zstd":
+        body = zstandard.ZstdCompressor().compress(body)
+        headers["Content-Encoding"] = "zstd"
+    elif encoding == "gzip":
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+    return body, headers
+
+
+def _choose_encoding(accept_encoding: str | None) -> str | None:
+    """Accept-Encoding から zstd / gzip のどちらで圧縮するかを選ぶ（どちらも不可なら None）
+
+    q 値の高いほうを選び、同じなら zstd を優先する。q=0 は明示的な拒否として扱う。
+    """
+    weights: dict[str, float] = {}
+    for entry in (accept_encoding or "").split(","):
+        name, *params = (p.strip() for p in entry.split(";"))
+        if not name:
+            continue
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+                if not 0.0 <= q <= 1.0:
+                    q = 0.0  # 範囲外・NaN は不正な値として受け付けない
+        weights[name.lower()] = q
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [(weights.get(e, wildcard), e) for e in ("zstd", "gzip")]
+    q, encoding = max(candidates, key=lambda c: c[0])  # 同じ q なら先頭（zstd）
+    return encoding if q > 0 else None
@@ -0,0 +1,146 @@
+"""同期プロトコルのベンチマーク（JSON と MessagePack / CBOR の列指向形式の比較）
+
+使い方（server ディレクトリで実行）:
+
+    # ペイロードサイズとエンコード/デコード時間の比較
+    python -m bench.sync_protocol
+
+    # 起動中のサーバーに対して POST /sync/expenses のエンドツーエンド時間も計測
+    python -m bench.sync_protocol --url http://localhost:8000 --api-key household-app-secret-key-2024 --allow-writes
+
+注意: エンドツーエンド計測は対象サーバーのDBに実際に書き込みます。
+固定UUID（household-bench-*）・op="delete" のアイテムを upsert するため集計結果には含まれませんが、
+論理削除済みの行として最大 --items 件がDBに残り続け、集計ビューのリフレッシュも発生します。
+本番の家計簿DBではなく、検証用のDBを使うサーバーに対して実行してください。
+書き込みを了承したことを示すため --allow-writes の指定が必要です。
+"""
+import argparse
+import gzip
+import json
+import random
+import statistics
+import time
+import urllib.request
+import uuid
+from datetime import date, timedelta
+import cbor2
+import msgpack
+import zstandard
+
+from app.constants.category import CATEGORY_ORDER
+from app.sync_codec import JSON, MSGPACK, CBOR, COLUMNS, decode_sync_request
+
+NOTES = [None, "ランチ", "スーパー", "ドラッグストア", "電車", "コンビニ"]
+
+
+def make_items(n: int) -> list[dict]:
+    rng = random.Random(0)
+    base = date(2024, 1, 1)
+    return [
+        {
+            "client_uuid": str(uuid.uuid5(uuid.NAMESPACE_URL, f"household-bench-{i}")),
+            "date": (base + timedelta(days=rng.randrange(365))).isoformat(),
+            "amount": rng.randrange(100, 20000),
+            "category": rng.choice(CATEGORY_ORDER),
+            "note": rng.choice(NOTES),
+            "paid_by": rng.choice(["me", "her"]),
+            "op": "delete",
+        }
+        for i in range(n)
+    ]
+
+
+def to_columns(items: list[dict]) -> dict:
+    return {c: [item[c] for item in items] for c in COLUMNS}
+
+
+def encode(items: list[dict], media_type: str, encoding: str) -> bytes:
+    if media_type == JSON:
+        body = json.dumps({"items": items}, ensure_ascii=False).encode()
+    elif media_type == MSGPACK:
+        body = msgpack.packb(to_columns(items))
+    else:
+        body = cbor2.dumps(to_columns(items))
+
+    if encoding == "gzip":
+        return gzip.compress(body)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor().compress(body)
+    return body
+
+
+def timed(fn, repeat: int) -> float:
+    """fn を repeat 回実行し、中央値（ミリ秒）を返す"""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def post(url: str, api_key: str, body: bytes, media_type: str, encoding: str) -> None:
+    headers = {
+        "Content-Type": media_type,
+        "X-API-Key": api_key,
+        "Accept-Encoding": "zstd, gzip" if media_type != JSON else "identity",
+    }
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    req = urllib.request.Request(f"{url.rstrip('/')}/sync/expenses", data=body, headers=headers, method="POST")
+    with urllib.request.urlopen(req) as res:
+        res.read()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="1リクエストあたりの件数（既定: 1000）")
+    parser.add_argument("--repeat", type=int, default=20, help="計測の繰り返し回数（既定: 20）")
+    parser.add_argument("--mbps", type=float, default=5.0, help="転送時間の見積もりに使う回線速度 Mbps（既定: 5）")
+    parser.add_argument("--url", help="エンドツーエンド計測するサーバーのURL（省略時は計測しない）")
+    parser.add_argument("--api-key", default="household-app-secret-key-2024", help="X-API-Key")
+    parser.add_argument(
+        "--allow-writes",
+        action="store_true",
+        help="--url 指定時に必須。対象DBに論理削除済みのベンチマーク行が残ることを了承する",
+    )
+    args = parser.parse_args()
+    if args.url and not args.allow_writes:
+        parser.error("--url writes benchmark rows to the server's database; use a scratch database and pass --allow-writes")
+
+    items = make_items(args.items)
+    variants = [
+        (media_type, encoding)
+        for media_type in (JSON, MSGPACK, CBOR)
+        for encoding in ("identity", "gzip", "zstd")
+    ]
+
+    header = f"{'format':<22}{'encoding':<10}{'bytes':>10}{'ratio':>8}{'encode ms':>11}{'decode ms':>11}{'transfer ms':>13}"
+    if args.url:
+        header += f"{'e2e ms':>10}"
+    print(f"{args.items} items, transfer estimated at {args.mbps} Mbps")
+    print(header)
+
+    baseline = None
+    for media_type, encoding in variants:
+        body = encode(items, media_type, encoding)
+        baseline = baseline or len(body)
+        encode_ms = timed(lambda: encode(items, media_type, encoding), args.repeat)
+        decode_ms = timed(lambda: decode_sync_request(body, media_type, encoding), args.repeat)
+        transfer_ms = len(body) * 8 / (args.mbps * 1_000_000) * 1000
+        line = (
+            f"{media_type:<22}{encoding:<10}{len(body):>10}{len(body) / baseline:>8.2f}"
+            f"{encode_ms:>11.2f}{decode_ms:>11.2f}{transfer_ms:>13.1f}"
+        )
+        if args.url:
+            # クライアント側のエンコード + 送信 + サーバー処理 + レスポンス受信
+            e2e_ms = timed(
+                lambda: post(args.url, args.api_key, encode(items, media_type, encoding), media_type, encoding),
+                args.repeat,
+            )
+            line += f"{e2e_ms:>10.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""集計のビュー／生データの月の振り分けと、ビューのリフレッシュ予約のテスト（DBには接続しない）
+
+使い方（server ディレクトリで実行）: python -m pytest tests
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://localhost/household_test")
+
+from datetime import date
+
+import pytest
+
+from app import summary_view
+from app.routers.summary import _full_month_range
+from app.summary_view import SummaryViewRefresher
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "expected"),
+    [
+        # 月初〜月末: 丸ごとビューから
+        (date(2024, 1, 1), date(2024, 3, 31), (date(2024, 1, 1), date(2024, 4, 1))),
+        # 月の途中から: 開始月は生データ
+        (date(2024, 1, 15), date(2024, 3, 31), (date(2024, 2, 1), date(2024, 4, 1))),
+        # 月の途中まで: 終了月は生データ
+        (date(2024, 1, 1), date(2024, 3, 15), (date(2024, 1, 1), date(2024, 3, 1))),
+        # 両端とも途中
+        (date(2024, 1, 15), date(2024, 3, 15), (date(2024, 2, 1), date(2024, 3, 1))),
+        # 1か月だけ丸ごと
+        (date(2024, 4, 1), date(2024, 4, 30), (date(2024, 4, 1), date(2024, 5, 1))),
+        # 1か月の中に収まる期間
+        (date(2024, 4, 2), date(2024, 4, 29), None),
+        (date(2024, 4, 1), date(2024, 4, 29), None),
+        (date(2024, 4, 2), date(2024, 4, 30), None),
+        # 丸ごと含まれる月がない（隣り合う月の途中どうし）
+        (date(2024, 4, 15), date(2024, 5, 15), None),
+        # 12月→1月をまたぐ
+        (date(2023, 12, 1), date(2024, 1, 31), (date(2023, 12, 1), date(2024, 2, 1))),
+        (date(2023, 11, 15), date(2024, 1, 31), (date(2023, 12, 1), date(2024, 2, 1))),
+        (date(2023, 12, 15), date(2024, 1, 31), (date(2024, 1, 1), date(2024, 2, 1))),
+        (date(2023, 12, 1), date(2024, 1, 15), (date(2023, 12, 1), date(2024, 1, 1))),
+        # うるう年の2月29日は月末
+        (date(2024, 2, 1), date(2024, 2, 29), (date(2024, 2, 1), date(2024, 3, 1))),
+        (date(2024, 2, 1), date(2024, 2, 28), None),
+        (date(2023, 2, 1), date(2023, 2, 28), (date(2023, 2, 1), date(2023, 3, 1))),
+        # date の上限付近はビューを使わない
+        (date(9999, 11, 1), date.max, None),
+        (date(9999, 12, 1), date(9999, 12, 30), None),
+        (date(9999, 12, 15), date(9999, 12, 30), None),
+        (date(9999, 11, 1), date(9999, 11, 30), (date(9999, 11, 1), date(9999, 12, 1))),
+        (date(9999, 10, 15), date(9999, 12, 30), (date(9999, 11, 1), date(9999, 12, 1))),
+    ],
+)
+def test_full_month_range(start, end, expected):
+    assert _full_month_range(start, end) == expected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(summary_view, "time", clock)
+    return clock
+
+
+def test_mark_dirty_debounces(clock):
+    refresher = SummaryViewRefresher(None, debounce=2.0, max_wait=10.0)
+    refresher.mark_dirty()
+    assert refresher._due_at == 1002.0
+    clock.now += 1.0
+    refresher.mark_dirty()
+    assert refresher._due_at == 1003.0
+    assert refresher._first_dirty_at == 1000.0
+
+
+def test_mark_dirty_does_not_postpone_past_max_wait(clock):
+    refresher = SummaryViewRefresher(None, debounce=2.0, max_wait=10.0)
+    for _ in range(20):
+        refresher.mark_dirty()
+        assert refresher._due_at <= 1000.0 + 10.0
+        clock.now += 1.0
+    assert refresher._due_at == 1010.0
+
+
+def test_wait_until_due_resets_pending_state(clock):
+    refresher = SummaryViewRefresher(None, debounce=2.0, max_wait=10.0)
+    refresher.mark_dirty()
+    clock.now += 5.0
+    assert refresher._wait_until_due() is True
+    assert refresher._due_at is None
+    assert refresher._first_dirty_at is None
+
+    # 次の書き込みは新しい起点から max_wait を数える
+    refresher.mark_dirty()
+    assert refresher._first_dirty_at == 1005.0
+    assert refresher._due_at == 1007.0
@@ -0,0 +1,173 @@
+"""POST /sync/expenses のバイナリ形式のデコードとレスポンス圧縮のテスト
+
+列指向のMessagePack / CBORがJSONと同じ検証結果になること、
+不正なボディが500ではなく400になることを確認する（DBには接続しない）。
+使い方（server ディレクトリで実行）: python -m pytest tests
+"""
+import gzip
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql+psycopg://localhost/household_test")
+
+import json
+
+import cbor2
+import msgpack
+import pytest
+import zstandard
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.db import get_db
+from app.routers.sync import router
+from app.sync_codec import CBOR, JSON, MAX_DECODED_BYTES, MSGPACK, decode_sync_request, encode_compact_response
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: None  # デコードで失敗するのでDBは使われない
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def columns(**overrides) -> dict:
+    cols = {
+        "client_uuid": ["0123456789abcdef"],
+        "date": ["2024-01-01"],
+        "amount": [100],
+        "category": ["食費"],
+        "paid_by": ["me"],
+    }
+    cols.update(overrides)
+    return cols
+
+
+def pack(cols: dict, media_type: str) -> bytes:
+    return msgpack.packb(cols) if media_type == MSGPACK else cbor2.dumps(cols)
+
+
+def post(client: TestClient, body: bytes, media_type: str):
+    return client.post("/sync/expenses", content=body, headers={"Content-Type": media_type})
+
+
+ITEMS = [
+    {"client_uuid": "0123456789abcdef", "date": "2024-01-01", "amount": 100, "category": "食費", "note": "ランチ", "paid_by": "me", "op": "upsert"},
+    {"client_uuid": "fedcba9876543210", "date": "2024-02-29", "amount": 0, "category": "日用品", "note": None, "paid_by": "her", "op": "delete"},
+]
+
+
+def as_columns(items: list[dict], names: tuple[str, ...]) -> dict:
+    return {c: [item[c] for item in items] for c in names}
+
+
+def decode_json(items: list[dict]):
+    payload, _ = decode_sync_request(json.dumps({"items": items}).encode(), JSON, None)
+    return payload
+
+
+@pytest.mark.parametrize("media_type", [MSGPACK, CBOR])
+def test_columns_decode_same_as_json(media_type):
+    cols = as_columns(ITEMS, ("client_uuid", "date", "amount", "category", "note", "paid_by", "op"))
+    payload, decoded_type = decode_sync_request(pack(cols, media_type), media_type, None)
+    assert decoded_type == media_type
+    assert payload == decode_json(ITEMS)
+
+
+@pytest.mark.parametrize("media_type", [MSGPACK, CBOR])
+def test_optional_columns_default_like_json(media_type):
+    names = ("client_uuid", "date", "amount", "category", "paid_by")
+    items = [{c: item[c] for c in names} for item in ITEMS]
+    payload, _ = decode_sync_request(pack(as_columns(items, names), media_type), media_type, None)
+    assert payload == decode_json(items)
+    assert [(i.note, i.op) for i in payload.items] == [(None, "upsert"), (None, "upsert")]
+
+
+@pytest.mark.parametrize("media_type", [MSGPACK, CBOR])
+@pytest.mark.parametrize(
+    ("encoding", "compress"),
+    [
+        ("gzip", gzip.compress),
+        ("zstd", zstandard.ZstdCompressor().compress),
+        # 複数メンバー / 複数フレームの連結
+        ("gzip", lambda b: gzip.compress(b[:10]) + gzip.compress(b[10:])),
+        ("zstd", lambda b: zstandard.ZstdCompressor().compress(b[:10]) + zstandard.ZstdCompressor().compress(b[10:])),
+    ],
+)
+def test_compressed_request_body(media_type, encoding, compress):
+    cols = as_columns(ITEMS, ("client_uuid", "date", "amount", "category", "note", "paid_by", "op"))
+    payload, _ = decode_sync_request(compress(pack(cols, media_type)), media_type, encoding)
+    assert payload == decode_json(ITEMS)
+
+
+@pytest.mark.parametrize(
+    ("encoding", "compress"),
+    [("gzip", gzip.compress), ("zstd", zstandard.ZstdCompressor().compress)],
+)
+def test_decompressed_body_over_limit_is_rejected(encoding, compress):
+    body = compress(b"\0" * (MAX_DECODED_BYTES + 1))
+    with pytest.raises(HTTPException) as e:
+        decode_sync_request(body, MSGPACK, encoding)
+    assert e.value.status_code == 413
+
+
+def test_unknown_content_encoding_is_rejected():
+    with pytest.raises(HTTPException) as e:
+        decode_sync_request(b"", MSGPACK, "br")
+    assert e.value.status_code == 415
+
+
+@pytest.mark.parametrize("media_type", [MSGPACK, CBOR])
+def test_bytes_value_is_rejected(client, media_type):
+    res = post(client, pack(columns(category=[b"\xff"]), media_type), media_type)
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize("media_type", [MSGPACK, CBOR])
+def test_nan_is_rejected(client, media_type):
+    res = post(client, pack(columns(amount=[float("nan")]), media_type), media_type)
+    assert res.status_code == 400
+
+
+def test_cbor_undefined_is_rejected(client):
+    res = post(client, pack(columns(note=[cbor2.undefined]), CBOR), CBOR)
+    assert res.status_code == 400
+
+
+def test_cbor_unknown_tag_is_rejected(client):
+    res = post(client, pack(columns(date=[cbor2.CBORTag(9999, "2024-01-01")]), CBOR), CBOR)
+    assert res.status_code == 400
+
+
+def test_deeply_nested_cbor_is_rejected(client):
+    res = post(client, b"\x81" * 100000, CBOR)
+    assert res.status_code == 400
+
+
+def test_invalid_scalar_still_returns_422(client):
+    res = post(client, pack(columns(paid_by=["someone"]), CBOR), CBOR)
+    assert res.status_code == 422
+    assert res.json()["detail"][0]["loc"] == ["body", "items", 0, "paid_by"]
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("zstd, gzip", "zstd"),
+        ("zstd;q=0, gzip", "gzip"),
+        ("zstd;q=0.5, gzip", "gzip"),
+        ("gzip;q=0, zstd;q=0", None),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "gzip"),
+        ("identity", None),
+        (None, None),
+    ],
+)
+def test_response_encoding_honours_q_values(accept_encoding, expected):
+    body, headers = encode_compact_response(1, [], CBOR, accept_encoding)
+    assert headers.get("Content-Encoding") == expected
+    if expected == "zstd":
+        body = zstandard.ZstdDecompressor().decompress(body)
+    elif expected == "gzip":
+        body = gzip.decompress(body)
+    assert cbor2.loads(body) == {"ok": 1, "ng": []}